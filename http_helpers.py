@@ -0,0 +1,76 @@
+"""
+SahaAI HTTP helpers - response class, upload limits, static files and the
+in-memory index page shared by main.py, cfo_api.py and main_cfo.py.
+"""
+from hashlib import blake2b
+from pathlib import Path
+
+import orjson
+from fastapi import HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+# Images are sent inline. Raw phone photos up to Gemini's 20 MB inline limit are
+# accepted and downscaled first; only the bytes actually sent are capped at 4 MB.
+MAX_RAW_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_INLINE_UPLOAD_BYTES = 4 * 1024 * 1024
+
+# Static file names are not fingerprinted, so only files that practically never
+# change get the year-long cache; everything else revalidates hourly like "/".
+LONG_CACHE_FILES = frozenset({"favicon.ico"})
+LONG_CACHE_CONTROL = "public, max-age=31536000, immutable"
+SHORT_CACHE_CONTROL = "public, max-age=3600"
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (FastAPI's own ORJSONResponse is deprecated)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+async def read_inline_upload(file: UploadFile) -> bytes:
+    """Read an upload to downscale and send inline; larger than MAX_RAW_UPLOAD_BYTES -> 413."""
+    too_large = HTTPException(status_code=413, detail="File too large (max 20 MB)")
+    if file.size is not None and file.size > MAX_RAW_UPLOAD_BYTES:
+        raise too_large
+    data = await file.read(MAX_RAW_UPLOAD_BYTES + 1)
+    if len(data) > MAX_RAW_UPLOAD_BYTES:
+        raise too_large
+    return data
+
+
+def check_inline_size(data: bytes) -> None:
+    """413 when the bytes about to be sent inline are still over MAX_INLINE_UPLOAD_BYTES."""
+    if len(data) > MAX_INLINE_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large even after resizing (max 4 MB)")
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with Cache-Control: a year for LONG_CACHE_FILES, an hour for the rest."""
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = (
+                LONG_CACHE_CONTROL if path in LONG_CACHE_FILES else SHORT_CACHE_CONTROL
+            )
+        return response
+
+
+def cached_index(path: Path) -> tuple[bytes | None, dict[str, str]]:
+    """Read an index.html once at startup: (body, ETag/Cache-Control headers), or (None, {}) if missing."""
+    if not path.is_file():
+        return None, {}
+    body = path.read_bytes()
+    return body, {
+        "ETag": f'"{blake2b(body, digest_size=16).hexdigest()}"',
+        "Cache-Control": SHORT_CACHE_CONTROL,
+    }
+
+
+def serve_index(request: Request, body: bytes, headers: dict[str, str]) -> Response:
+    """Serve a cached_index() page from memory; 304 when the browser already has this ETag."""
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="text/html", headers=headers)
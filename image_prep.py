@@ -0,0 +1,40 @@
+"""
+SahaAI image prep - shrink uploaded receipt/bill photos before sending them to Gemini.
+
+A 1024px longest edge is plenty for text extraction and cuts upload size and
+per-image tokens; call downscale_image via asyncio.to_thread (it is CPU-bound).
+"""
+import io
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+MAX_EDGE = 1024
+JPEG_QUALITY = 85
+
+
+def downscale_image(data: bytes, mime: str) -> tuple[bytes, str]:
+    """Return (bytes, mime) resized to MAX_EDGE and re-encoded as JPEG; small JPEGs and unreadable data pass through."""
+    try:
+        img = Image.open(io.BytesIO(data))
+        if max(img.size) <= MAX_EDGE and mime == "image/jpeg":
+            return data, mime
+        img = ImageOps.exif_transpose(img)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return data, mime
+
+    img.thumbnail((MAX_EDGE, MAX_EDGE), Image.Resampling.LANCZOS)
+    if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+        # JPEG has no alpha: composite onto white, or transparent areas turn black.
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, "white")
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    out = buf.getvalue()
+    # A small PNG can grow as JPEG; only swap when it actually saves bytes.
+    if len(out) >= len(data):
+        return data, mime
+    return out, "image/jpeg"
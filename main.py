@@ -1,17 +1,23 @@
 import os
-import json
-import re
-import io
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from functools import lru_cache
 from pathlib import Path
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, Response
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+import aiohttp
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict
 import edge_tts
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
+from http_helpers import (
+    CachedStaticFiles, ORJSONResponse, cached_index, check_inline_size, read_inline_upload, serve_index,
+)
+from image_prep import downscale_image
+from prompt_cache import PromptCache, file_prompt_key, prompt_key
+
 # -----------------------------
 # Load Environment Variables
 # -----------------------------
@@ -21,50 +27,140 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found in .env file")
 
+GEMINI_MODEL = "gemini-2.5-flash"
+
 # -----------------------------
-# Gemini Client
+# Prompts (constant text; per-request values go through str.format)
 # -----------------------------
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
-GEMINI_MODEL = "gemini-2.5-flash"
+_CHAT_PROMPT_TMPL = """
+You are a financial assistant.
+
+Extract income, expenses and emi from the following text.
+Return ONLY valid JSON.
+
+Text:
+{message}
+
+Format:
+{{
+  "income": number,
+  "expenses": number,
+  "emi": number
+}}
+"""
+
+_IMAGE_PROMPT = """Look at this image (receipt, bill, or expense document).
+1. Briefly describe what you see (extracted text / key details).
+2. Extract the total expense amount as a number if visible; otherwise use 0.
+
+Return ONLY valid JSON in this exact format:
+{"extracted_text": "your description here", "expense": number}"""
+
+_TRANSCRIBE_PROMPT = "Transcribe this audio to text. Return only the raw transcription, nothing else. No punctuation or formatting instructions."
 
-def _parse_json_from_text(text: str) -> dict:
-    """Extract JSON from model response, handling markdown code blocks."""
-    text = text.strip()
-    match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", text)
-    if match:
-        text = match.group(1).strip()
-    return json.loads(text)
+# -----------------------------
+# Gemini Client (one per worker, pooled session)
+# -----------------------------
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=200, limit_per_host=100, keepalive_timeout=75),
+        trust_env=True,
+    )
+    client = genai.Client(
+        api_key=GEMINI_API_KEY,
+        http_options=types.HttpOptions(aiohttp_client=session),
+    )
+    app.state.genai = client
+    try:
+        yield
+    finally:
+        await client.aio.aclose()
+        client.close()
+        await session.close()
 
 # -----------------------------
 # Initialize App
 # -----------------------------
-app = FastAPI(title="SahaAi - Personal AI CFO")
+app = FastAPI(
+    title="SahaAi - Personal AI CFO",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# -----------------------------
+# Gemini call (cached)
+# -----------------------------
+prompt_cache = PromptCache(maxsize=4096)
+
+
+async def _cached(key: str, produce):
+    """Return the cached output for key, else await produce() and cache it."""
+    cached = prompt_cache.get(key)
+    if cached is not None:
+        return cached
+    value = await produce()
+    if value:
+        prompt_cache.put(key, value)
+    return value
+
+
+async def _call_gemini(contents, schema: type[BaseModel] | None = None):
+    """Call Gemini at temperature 0; with a schema, returns the parsed result as a dict, else text."""
+    if schema is None:
+        config = types.GenerateContentConfig(temperature=0)
+    else:
+        config = types.GenerateContentConfig(
+            temperature=0,
+            response_mime_type="application/json",
+            response_schema=schema,
+        )
+    response = await app.state.genai.aio.models.generate_content(
+        model=GEMINI_MODEL,
+        contents=contents,
+        config=config,
+    )
+    if schema is None:
+        return response.text or ""
+    if response.parsed is None:
+        raise ValueError("Gemini returned no structured output")
+    return response.parsed.model_dump()
+
+
+async def _generate_json(contents, key: str, schema: type[BaseModel]) -> dict:
+    """Structured Gemini call; identical prompts/uploads are served from the cache."""
+    return await _cached(key, lambda: _call_gemini(contents, schema))
 
 # -----------------------------
 # Financial Analysis Engine
 # -----------------------------
-def analyze_financial_data(income: float, expenses: float, emi: float):
+RISK_LEVELS = ("Low Risk", "Moderate Risk", "High Risk")
+ADVICE = (
+    "You are overspending. Reduce expenses immediately.",
+    "Increase savings. Try to save at least 20% of income.",
+    "Your financial health looks stable.",
+)
 
+
+@lru_cache(maxsize=1024)
+def _analysis_components(income: float, expenses: float, emi: float) -> tuple[float, float, str, str]:
     savings = income - expenses - emi
-    dti = emi / income if income > 0 else 0
+    if income <= 0:
+        return savings, 0, RISK_LEVELS[0], ADVICE[2 * (savings >= 0)]
 
-    if dti > 0.4:
-        risk = "High Risk"
-    elif dti > 0.25:
-        risk = "Moderate Risk"
-    else:
-        risk = "Low Risk"
+    dti = emi / income
+    # Branchless: summed bools index straight into the label tables.
+    risk = RISK_LEVELS[(dti > 0.25) + (dti > 0.4)]
+    advice = ADVICE[(savings >= 0) + (savings >= 0.2 * income)]
+    return savings, round(dti * 100, 2), risk, advice
 
-    if savings < 0:
-        advice = "You are overspending. Reduce expenses immediately."
-    elif savings < 0.2 * income:
-        advice = "Increase savings. Try to save at least 20% of income."
-    else:
-        advice = "Your financial health looks stable."
 
+def analyze_financial_data(income: float, expenses: float, emi: float):
+    # Exact inputs are the cache key, so repeat submissions hit and results never shift.
+    savings, dti_percent, risk, advice = _analysis_components(float(income), float(expenses), float(emi))
     return {
         "savings": savings,
-        "dti_percent": round(dti * 100, 2),
+        "dti_percent": dti_percent,
         "risk_level": risk,
         "advice": advice
     }
@@ -73,38 +169,26 @@ def analyze_financial_data(income: float, expenses: float, emi: float):
 # Request Models
 # -----------------------------
 class ChatInput(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     message: str
 
+
+class ChatExtract(BaseModel):
+    income: float
+    expenses: float
+    emi: float
+
 # -----------------------------
 # CHAT ENDPOINT
 # -----------------------------
 @app.post("/chat")
-def chat_with_sahaai(data: ChatInput):
-
-    prompt = f"""
-You are a financial assistant.
-
-Extract income, expenses and emi from the following text.
-Return ONLY valid JSON.
+async def chat_with_sahaai(data: ChatInput):
 
-Text:
-{data.message}
-
-Format:
-{{
-  "income": number,
-  "expenses": number,
-  "emi": number
-}}
-"""
+    prompt = _CHAT_PROMPT_TMPL.format(message=data.message)
 
     try:
-        response = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=0),
-        )
-        structured_data = _parse_json_from_text(response.text)
+        structured_data = await _generate_json(prompt, prompt_key(prompt), ChatExtract)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini API Error: {str(e)}")
 
@@ -122,32 +206,30 @@ Format:
 # -----------------------------
 # IMAGE ENDPOINT
 # -----------------------------
+class ImageExtract(BaseModel):
+    extracted_text: str
+    expense: float
+
+
 @app.post("/analyze-image")
 async def analyze_image(file: UploadFile = File(...)):
-    image_bytes = await file.read()
+    image_bytes = await read_inline_upload(file)
     mime = file.content_type or "image/jpeg"
     if mime not in ("image/jpeg", "image/png", "image/gif", "image/webp"):
         mime = "image/jpeg"
 
-    prompt = """Look at this image (receipt, bill, or expense document).
-1. Briefly describe what you see (extracted text / key details).
-2. Extract the total expense amount as a number if visible; otherwise use 0.
-
-Return ONLY valid JSON in this exact format:
-{"extracted_text": "your description here", "expense": number}"""
+    async def produce():
+        # Resize only on a cache miss; the key is taken from the original upload.
+        data, data_mime = await asyncio.to_thread(downscale_image, image_bytes, mime)
+        check_inline_size(data)
+        return await _call_gemini([types.Part.from_bytes(data=data, mime_type=data_mime), _IMAGE_PROMPT], ImageExtract)
 
     try:
-        response = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[
-                types.Part.from_bytes(data=image_bytes, mime_type=mime),
-                prompt,
-            ],
-            config=types.GenerateContentConfig(temperature=0),
-        )
-        data = _parse_json_from_text(response.text)
+        data = await _cached(prompt_key(_IMAGE_PROMPT, image_bytes), produce)
         extracted_text = data.get("extracted_text", "")
         expense = data.get("expense", 0)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini Vision API Error: {str(e)}")
 
@@ -175,20 +257,26 @@ AUDIO_MIME_MAP = {
 @app.post("/transcribe")
 async def transcribe_audio(file: UploadFile = File(...)):
     """Upload an audio file; returns transcript via Gemini."""
-    audio_bytes = await file.read()
     mime = (file.content_type or "").strip().lower()
     if mime not in AUDIO_MIME_MAP:
         mime = "audio/mpeg"
-    try:
-        response = gemini_client.models.generate_content(
-            model=GEMINI_MODEL,
-            contents=[
-                "Transcribe this audio to text. Return only the raw transcription, nothing else. No punctuation or formatting instructions.",
-                types.Part.from_bytes(data=audio_bytes, mime_type=mime),
-            ],
-            config=types.GenerateContentConfig(temperature=0),
+
+    async def produce():
+        # Stream the spooled upload to the Files API instead of reading it into memory.
+        uploaded = await app.state.genai.aio.files.upload(
+            file=file.file,
+            config=types.UploadFileConfig(mime_type=mime),
         )
-        text = (response.text or "").strip()
+        try:
+            return await _call_gemini([_TRANSCRIBE_PROMPT, uploaded])
+        finally:
+            with suppress(Exception):
+                await app.state.genai.aio.files.delete(name=uploaded.name)
+
+    try:
+        key = await asyncio.to_thread(file_prompt_key, _TRANSCRIBE_PROMPT, file.file)
+        raw = await _cached(key, produce)
+        text = raw.strip()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"ASR Error: {str(e)}")
     return {"text": text}
@@ -198,45 +286,79 @@ async def transcribe_audio(file: UploadFile = File(...)):
 # TTS – text to speech (edge-tts)
 # -----------------------------
 TTS_VOICE = "en-US-JennyNeural"
+# edge-tts needs a fresh WebSocket per utterance, so repeated short phrases
+# are kept in memory and replayed without touching the network.
+TTS_CACHE_MAX_CHARS = 500
+tts_cache = PromptCache(maxsize=256)
 
 
 class TTSInput(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     text: str
 
 
+async def _tts_audio(text: str):
+    """Yield MP3 chunks from edge-tts as they arrive."""
+    async for chunk in edge_tts.Communicate(text, TTS_VOICE).stream():
+        if chunk.get("type") == "audio":
+            yield chunk["data"]
+
+
 @app.post("/speak")
 async def text_to_speech(data: TTSInput):
-    """Convert text to speech; returns MP3 audio."""
+    """Convert text to speech; streams MP3 audio."""
     text = (data.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="text is required")
-    buf = io.BytesIO()
+    key = prompt_key(text, TTS_VOICE.encode())
+    cached = tts_cache.get(key)
+    if cached is not None:
+        return Response(content=cached, media_type="audio/mpeg")
+
+    audio = _tts_audio(text)
+    # Pull the first chunk here so connection/voice errors still return a 500.
     try:
-        communicate = edge_tts.Communicate(text, TTS_VOICE)
-        async for chunk in communicate.stream():
-            if chunk.get("type") == "audio":
-                buf.write(chunk["data"])
+        first = await anext(audio)
+    except StopAsyncIteration:
+        first = b""
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"TTS Error: {str(e)}")
-    buf.seek(0)
-    return Response(content=buf.read(), media_type="audio/mpeg")
+
+    cacheable = len(text) <= TTS_CACHE_MAX_CHARS
+
+    async def _gen():
+        chunks = [first]
+        yield first
+        async for chunk in audio:
+            if cacheable:
+                chunks.append(chunk)
+            yield chunk
+        if cacheable:
+            tts_cache.put(key, b"".join(chunks))
+
+    return StreamingResponse(_gen(), media_type="audio/mpeg")
 
 # -----------------------------
 # Health Check
 # -----------------------------
 @app.get("/health")
-def health():
-    return {"status": "SahaAi running successfully 🚀"}
+async def health():
+    return ORJSONResponse(content={"status": "SahaAi running successfully 🚀"})
 
 # -----------------------------
 # UI – serve frontend at /
 # -----------------------------
 _static_dir = Path(__file__).parent / "static"
 _index_html = _static_dir / "index.html"
+app.mount("/static", CachedStaticFiles(directory=_static_dir), name="static")
+
+# Read once at startup; "/" is then served from memory with browser caching.
+_INDEX_BYTES, _INDEX_HEADERS = cached_index(_index_html)
 
 
 @app.get("/")
-def serve_ui():
-    if _index_html.is_file():
-        return FileResponse(_index_html)
-    return {"message": "SahaAI API. Set up static/index.html for UI."}
\ No newline at end of file
+async def serve_ui(request: Request):
+    if _INDEX_BYTES is None:
+        return {"message": "SahaAI API. Set up static/index.html for UI."}
+    return serve_index(request, _INDEX_BYTES, _INDEX_HEADERS)
@@ -2,32 +2,40 @@
 SahaAI CFO – standalone app with UI.
 Serves the CFO API under /api and a dashboard UI at /.
 
-Run:  uvicorn main_cfo:app --reload --port 8001
+Dev:  uvicorn main_cfo:app --reload --workers 1 --port 8001
+Prod: gunicorn main_cfo:app -k uvicorn_worker.UvicornWorker --bind 0.0.0.0:8001 \
+          --workers $(nproc) --keep-alive 75
+      (with uvicorn[standard] installed the worker runs on uvloop + httptools;
+       each worker builds its own Gemini client in the lifespan, after the fork)
 Open: http://127.0.0.1:8001/
 """
 from pathlib import Path
-from fastapi import FastAPI
-from fastapi.responses import FileResponse, Response
+from fastapi import FastAPI, Request
 
-from cfo_api import app as cfo_app
+from cfo_api import app as cfo_app, lifespan as cfo_lifespan
+from http_helpers import CachedStaticFiles, ORJSONResponse, cached_index, serve_index
 
-app = FastAPI(title="SahaAI AI CFO", description="Receipt, statement, fraud, goals & score")
+# Mounted sub-apps don't run their own lifespan, so the parent runs the CFO one.
+app = FastAPI(
+    title="SahaAI AI CFO",
+    description="Receipt, statement, fraud, goals & score",
+    lifespan=cfo_lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # Mount CFO API under /api (so /api/analyze-receipt, /api/health, etc.)
 app.mount("/api", cfo_app)
 
-# Serve CFO dashboard UI at /
+# Serve CFO dashboard UI at / and its assets (favicon) at /static
 _static_cfo = Path(__file__).parent / "static_cfo"
+app.mount("/static", CachedStaticFiles(directory=_static_cfo), name="static")
 _index = _static_cfo / "index.html"
+# Read once at startup; "/" is then served from memory with browser caching.
+_INDEX_BYTES, _INDEX_HEADERS = cached_index(_index)
 
 
 @app.get("/")
-def serve_cfo_ui():
-    if _index.is_file():
-        return FileResponse(_index)
-    return {"message": "CFO UI not found. Add static_cfo/index.html", "api": "/api/docs"}
-
-
-@app.get("/favicon.ico")
-def favicon():
-    return Response(status_code=204)
+async def serve_cfo_ui(request: Request):
+    if _INDEX_BYTES is None:
+        return {"message": "CFO UI not found. Add static_cfo/index.html", "api": "/api/docs"}
+    return serve_index(request, _INDEX_BYTES, _INDEX_HEADERS)
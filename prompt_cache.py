@@ -0,0 +1,111 @@
+"""
+SahaAI prompt caches - in-process caches in front of Gemini calls.
+
+PromptCache:   exact-match LRU keyed by blake2b(payload bytes + prompt).
+SemanticCache: optional near-duplicate cache for short user texts
+               (ENABLE_SEMANTIC_CACHE=1, needs sentence-transformers + faiss-cpu).
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, BinaryIO
+
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def prompt_key(prompt: str, data: bytes = b"") -> str:
+    """Cache key for a prompt plus optional uploaded bytes (image/audio)."""
+    h = blake2b(data)
+    h.update(prompt.encode())
+    return h.hexdigest()
+
+
+def file_prompt_key(prompt: str, fileobj: BinaryIO, chunk_size: int = 1 << 20) -> str:
+    """prompt_key() for an upload, hashed in chunks so it is never fully in memory."""
+    h = blake2b()
+    fileobj.seek(0)
+    while chunk := fileobj.read(chunk_size):
+        h.update(chunk)
+    fileobj.seek(0)
+    h.update(prompt.encode())
+    return h.hexdigest()
+
+
+class PromptCache:
+    """Thread-safe LRU of model outputs keyed by prompt_key()."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class SemanticCache:
+    """Cosine-similarity cache: embeddings in a FAISS IndexFlatIP, outputs in a list."""
+
+    def __init__(self, threshold: float = 0.95, maxsize: int = 4096, model_name: str = SEMANTIC_MODEL):
+        try:
+            import faiss
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "ENABLE_SEMANTIC_CACHE needs sentence-transformers and faiss-cpu installed"
+            ) from e
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self._model = SentenceTransformer(model_name)
+        self._index = faiss.IndexFlatIP(self._model.get_sentence_embedding_dimension())
+        self._values: list[Any] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SemanticCache | None":
+        """Build the cache only when ENABLE_SEMANTIC_CACHE is truthy."""
+        if os.getenv("ENABLE_SEMANTIC_CACHE", "").strip().lower() not in ("1", "true", "yes", "on"):
+            return None
+        return cls()
+
+    def _embed(self, text: str):
+        # Normalized vectors make inner product == cosine similarity.
+        return self._model.encode([text], normalize_embeddings=True).astype("float32")
+
+    def _lookup(self, text: str) -> Any | None:
+        vec = self._embed(text)
+        with self._lock:
+            if self._index.ntotal == 0:
+                return None
+            scores, ids = self._index.search(vec, 1)
+            if scores[0][0] >= self.threshold:
+                return self._values[ids[0][0]]
+        return None
+
+    def _add(self, text: str, value: Any) -> None:
+        vec = self._embed(text)
+        with self._lock:
+            if self._index.ntotal >= self.maxsize:
+                self._index.reset()
+                self._values.clear()
+            self._index.add(vec)
+            self._values.append(value)
+
+    async def get(self, text: str) -> Any | None:
+        return await asyncio.to_thread(self._lookup, text)
+
+    async def put(self, text: str, value: Any) -> None:
+        await asyncio.to_thread(self._add, text, value)
@@ -0,0 +1,112 @@
+"""
+SahaAI request batcher - coalesces concurrent requests into one backend call.
+
+Each handler awaits submit(item); a background task collects up to max_batch
+items (waiting at most max_wait_ms after the first one) and resolves every
+caller from a single process(items) call. If that call fails or returns the
+wrong number of results, each item is retried through fallback(item) so one
+bad batch doesn't fail every caller in it.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class RequestBatcher:
+    """Micro-batcher: process(items) must return one result per item, in order."""
+
+    def __init__(
+        self,
+        process: Callable[[list[Any]], Awaitable[list[Any]]],
+        max_batch: int = 16,
+        max_wait_ms: float = 25,
+        fallback: Callable[[Any], Awaitable[Any]] | None = None,
+    ):
+        self._process = process
+        self._fallback = fallback
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Start the drain loop on the running event loop (call from lifespan)."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop collecting, let in-flight batches finish, fail anything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _item, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("RequestBatcher stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result from the next batch."""
+        if self._queue is None:
+            raise RuntimeError("RequestBatcher not started")
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((item, fut))
+        return await fut
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Dispatch without blocking collection of the next batch.
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        # Callers that disconnected while queued leave a cancelled future; skip them.
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        # Length-aware grouping: similar-sized items sit next to each other.
+        batch.sort(key=lambda entry: len(entry[0]))
+        items = [item for item, _fut in batch]
+        try:
+            results = await self._process(items)
+            if len(results) != len(items):
+                raise ValueError(f"batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            if self._fallback is not None:
+                await asyncio.gather(*(self._dispatch_one(item, fut) for item, fut in batch))
+                return
+            for _item, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_item, fut), result in zip(batch, results):
+            # Callers that disconnected leave a cancelled future behind.
+            if not fut.done():
+                fut.set_result(result)
+
+    async def _dispatch_one(self, item: Any, fut: asyncio.Future) -> None:
+        """Resolve one caller on its own, so its failure stays its own."""
+        if fut.done():
+            return
+        try:
+            result = await self._fallback(item)
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(result)
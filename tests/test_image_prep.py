@@ -0,0 +1,63 @@
+import io
+import os
+
+from PIL import Image, ImageDraw
+
+from image_prep import MAX_EDGE, downscale_image
+
+
+def _transparent_png(size: tuple[int, int]) -> bytes:
+    # Black receipt text on a fully transparent background (RGB under it is black too),
+    # plus a noisy opaque patch so the JPEG re-encode is actually smaller than the PNG.
+    img = Image.new("RGBA", size, (0, 0, 0, 0))
+    img.paste(Image.frombytes("RGB", (300, 200), os.urandom(300 * 200 * 3)), (size[0] - 320, size[1] - 220))
+    draw = ImageDraw.Draw(img)
+    draw.text((20, 20), "TOTAL RS 1234.00", fill=(0, 0, 0, 255))
+    draw.rectangle((20, 60, 300, 120), fill=(0, 0, 0, 255))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _decode(data: bytes) -> Image.Image:
+    return Image.open(io.BytesIO(data))
+
+
+def test_transparent_png_is_composited_onto_white():
+    for size in ((1500, 800), (800, 400)):
+        out, mime = downscale_image(_transparent_png(size), "image/png")
+        assert mime == "image/jpeg"
+        gray = _decode(out).convert("L")
+        scale = max(gray.size) / max(size)
+        # The transparent background comes out white, not black; the text block stays dark.
+        assert gray.getpixel((5, 5)) > 240
+        assert gray.getpixel((int(150 * scale), int(90 * scale))) < 64
+
+
+def test_palette_transparency_is_composited_onto_white():
+    # Noisy opaque photo in the middle so the JPEG re-encode is actually smaller.
+    rgb = Image.new("RGB", (1500, 800), (0, 0, 0))
+    rgb.paste(Image.frombytes("RGB", (600, 400), os.urandom(600 * 400 * 3)), (450, 200))
+    img = rgb.quantize(256)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", transparency=img.getpixel((0, 0)))
+    out, mime = downscale_image(buf.getvalue(), "image/png")
+    assert mime == "image/jpeg"
+    # The transparent corners come out white.
+    assert _decode(out).convert("L").getpixel((5, 5)) > 240
+
+
+def test_large_jpeg_is_resized():
+    buf = io.BytesIO()
+    Image.new("RGB", (3000, 2000), "white").save(buf, format="JPEG")
+    out, mime = downscale_image(buf.getvalue(), "image/jpeg")
+    assert mime == "image/jpeg"
+    assert max(_decode(out).size) == MAX_EDGE
+
+
+def test_small_jpeg_and_unreadable_data_pass_through():
+    buf = io.BytesIO()
+    Image.new("RGB", (200, 100), "white").save(buf, format="JPEG")
+    small = buf.getvalue()
+    assert downscale_image(small, "image/jpeg") == (small, "image/jpeg")
+    assert downscale_image(b"not an image", "image/png") == (b"not an image", "image/png")
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from request_batcher import RequestBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _with_batcher(batcher, body):
+    batcher.start()
+    try:
+        return await body()
+    finally:
+        await batcher.stop()
+
+
+def test_results_go_back_to_their_callers():
+    seen = []
+
+    async def process(items):
+        seen.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = RequestBatcher(process, max_batch=16, max_wait_ms=20)
+    items = ["ccc", "a", "bb", "dddd"]
+
+    async def body():
+        return await asyncio.gather(*(batcher.submit(i) for i in items))
+
+    assert run(_with_batcher(batcher, body)) == [i.upper() for i in items]
+    # One backend call, with the items grouped by length.
+    assert seen == [["a", "bb", "ccc", "dddd"]]
+
+
+def test_count_mismatch_fails_each_caller_without_fallback():
+    async def process(items):
+        return items[:-1]
+
+    batcher = RequestBatcher(process, max_wait_ms=20)
+
+    async def body():
+        return await asyncio.gather(*(batcher.submit(i) for i in ["a", "bb", "ccc"]), return_exceptions=True)
+
+    results = run(_with_batcher(batcher, body))
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_count_mismatch_falls_back_per_item():
+    async def process(items):
+        return items[:-1]
+
+    async def fallback(item):
+        if item == "bad":
+            raise RuntimeError("boom")
+        return item.upper()
+
+    batcher = RequestBatcher(process, max_wait_ms=20, fallback=fallback)
+
+    async def body():
+        return await asyncio.gather(*(batcher.submit(i) for i in ["a", "bad", "ccc"]), return_exceptions=True)
+
+    a, bad, ccc = run(_with_batcher(batcher, body))
+    assert (a, ccc) == ("A", "CCC")
+    # Only the failing item's caller sees the error.
+    assert isinstance(bad, RuntimeError)
+
+
+def test_cancelled_callers_are_skipped():
+    seen = []
+
+    async def process(items):
+        seen.append(list(items))
+        await asyncio.sleep(0.01)
+        return [item.upper() for item in items]
+
+    batcher = RequestBatcher(process, max_wait_ms=30)
+
+    async def body():
+        gone = asyncio.create_task(batcher.submit("gone"))
+        during = asyncio.create_task(batcher.submit("during"))
+        kept = asyncio.create_task(batcher.submit("kept"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        while not seen:
+            await asyncio.sleep(0.001)
+        # Cancelled while the batch is in flight: the others must still resolve.
+        during.cancel()
+        return await kept, gone.cancelled(), during.cancelled()
+
+    assert run(_with_batcher(batcher, body)) == ("KEPT", True, True)
+    assert seen == [["kept", "during"]]
+
+
+def test_submit_before_start_raises():
+    async def process(items):
+        return items
+
+    with pytest.raises(RuntimeError):
+        run(RequestBatcher(process).submit("a"))